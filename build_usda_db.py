@@ -0,0 +1,93 @@
+"""Build a local SQLite mirror of the USDA Foundation + SR Legacy datasets.
+
+Run once (or whenever USDA publishes a new release):
+
+    python build_usda_db.py [db_path]
+
+main.py picks the mirror up from USDA_DB_PATH (default: usda.sqlite next to it)
+and only falls back to the FoodData Central API for foods it cannot match.
+"""
+from dotenv import load_dotenv
+import io
+import os
+import sqlite3
+import sys
+import urllib.request
+import zipfile
+import ijson
+
+load_dotenv()
+
+# Release archive -> top-level JSON key holding its food list
+DATASETS = {
+    "https://fdc.nal.usda.gov/fdc-datasets/FoodData_Central_foundation_food_json_2024-10-31.zip": "FoundationFoods",
+    "https://fdc.nal.usda.gov/fdc-datasets/FoodData_Central_sr_legacy_food_json_2018-04.zip": "SRLegacyFoods"
+}
+
+SCHEMA = """
+    DROP TABLE IF EXISTS foods_fts;
+    DROP TABLE IF EXISTS food_nutrients;
+    DROP TABLE IF EXISTS foods;
+    CREATE TABLE foods (
+        fdc_id INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        data_type TEXT
+    );
+    CREATE TABLE food_nutrients (
+        fdc_id INTEGER NOT NULL REFERENCES foods(fdc_id),
+        nutrient_number TEXT NOT NULL,
+        amount REAL
+    );
+    CREATE INDEX food_nutrients_fdc_id ON food_nutrients(fdc_id);
+    CREATE VIRTUAL TABLE foods_fts USING fts5(
+        description, content='foods', content_rowid='fdc_id'
+    );
+"""
+
+def download(url: str) -> zipfile.ZipFile:
+    """Download a USDA release archive into memory"""
+    print(f"Downloading {url}")
+    with urllib.request.urlopen(url, timeout=120) as resp:
+        return zipfile.ZipFile(io.BytesIO(resp.read()))
+
+def load_dataset(db: sqlite3.Connection, archive: zipfile.ZipFile, key: str) -> int:
+    """Stream one release's foods and nutrient amounts into the mirror"""
+    name = next(n for n in archive.namelist() if n.endswith(".json"))
+    count = 0
+    with archive.open(name) as f:
+        for food in ijson.items(f, f"{key}.item", use_float=True):
+            db.execute(
+                "INSERT OR REPLACE INTO foods (fdc_id, description, data_type) VALUES (?, ?, ?)",
+                (food["fdcId"], food.get("description", ""), food.get("dataType"))
+            )
+            db.executemany(
+                "INSERT INTO food_nutrients (fdc_id, nutrient_number, amount) VALUES (?, ?, ?)",
+                [
+                    (food["fdcId"], n["nutrient"]["number"], n.get("amount", 0))
+                    for n in food.get("foodNutrients", [])
+                    if n.get("nutrient", {}).get("number")
+                ]
+            )
+            count += 1
+    return count
+
+def build(db_path: str):
+    """Create the mirror database from all configured USDA releases"""
+    db = sqlite3.connect(db_path)
+    try:
+        db.executescript(SCHEMA)
+        for url, key in DATASETS.items():
+            count = load_dataset(db, download(url), key)
+            print(f"Loaded {count} foods from {key}")
+        db.execute("INSERT INTO foods_fts(foods_fts) VALUES ('rebuild')")
+        db.commit()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    default_path = os.getenv(
+        "USDA_DB_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "usda.sqlite")
+    )
+    build(sys.argv[1] if len(sys.argv) > 1 else default_path)
+    print("Done.")
@@ -1,30 +1,126 @@
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 import os
-import requests
-import json
+import asyncio
+import aiohttp
+import ijson
+import logging
+import orjson
 import re
+import sqlite3
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from operator import itemgetter
+from typing import AsyncIterator
 
 # Load environment variables
 load_dotenv()
 deepseek_key = os.getenv("DEEPSEEK_API_KEY")
 usda_api_key = os.getenv("USDA_API_KEY")
 
-print("[DEBUG] DeepSeek Key:", deepseek_key[:8] + "..." if deepseek_key else "Not found")
-print("[DEBUG] USDA Key:", usda_api_key[:8] + "..." if usda_api_key else "Not found")
+# Agent debug output only when DEBUG=1; arguments are formatted lazily by logging
+DEBUG = os.getenv("DEBUG") == "1"
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG if DEBUG else logging.WARNING)
 
-# Initialize DeepSeek model
-llm = ChatOpenAI(
-    api_key=deepseek_key,
-    base_url="https://api.deepseek.com/v1",
-    model="deepseek-chat",
-    temperature=0.2,
-    max_tokens=1024
+# Initialize DeepSeek models
+_DEEPSEEK_CONFIG = {
+    "api_key": deepseek_key,
+    "base_url": "https://api.deepseek.com/v1",
+    "model": "deepseek-chat",
+    "max_tokens": 1024
+}
+
+# Deterministic JSON-mode parser, so identical inputs give identical (cacheable) items
+parse_llm = ChatOpenAI(**_DEEPSEEK_CONFIG, temperature=0, seed=0).bind(
+    response_format={"type": "json_object"}
 )
+analysis_llm = ChatOpenAI(**_DEEPSEEK_CONFIG, temperature=0.2)
+
+_BRACKET_PAIRS = {"]": "[", "}": "{"}
+
+class _JsonScanner:
+    """Bracket scanner over (possibly streamed) LLM output"""
+    
+    def __init__(self):
+        self.buffer = ""
+        self.first = None  # first balanced, valid JSON array/object, once complete
+        self.value = None  # first, decoded
+        self._pos = 0
+        self._emitted = -1  # end of the last object returned by feed
+        self._reset()
+    
+    def _reset(self):
+        self._starts = []
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, chunk: str) -> list:
+        """Append a chunk and return the JSON objects it completes"""
+        objects = []
+        self.buffer += chunk
+        buf = self.buffer
+        i = self._pos
+        while self.first is None and i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch in "[{":
+                self._starts.append(i)
+            elif not self._starts:
+                pass
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "]}":
+                start = self._starts[-1]
+                if buf[start] != _BRACKET_PAIRS[ch]:
+                    # Mismatched brackets: the outermost start cannot open JSON,
+                    # so rescan from just after it
+                    i = self._starts[0] + 1
+                    self._reset()
+                    continue
+                self._starts.pop()
+                if ch == "}" and i > self._emitted:
+                    objects.append(buf[start:i + 1])
+                    self._emitted = i
+                if not self._starts:
+                    try:
+                        self.value = orjson.loads(buf[start:i + 1])
+                        self.first = buf[start:i + 1]
+                    except orjson.JSONDecodeError:
+                        # Balanced prose such as "[note]"; try the next start
+                        i = start + 1
+                        self._reset()
+                        continue
+            i += 1
+        self._pos = i
+        return objects
+
+class _LRUCache(OrderedDict):
+    """Bounded LRU mapping; functools.lru_cache cannot memoize async results"""
+    
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
 
-def parse_food_amount(user_input: str) -> list:
-    """Parse food items and estimate portions from user input"""
-    prompt = f"""
+_PARSE_TMPL = """
     You are a nutrition assistant that extracts food items and their quantities from text.
     Follow these rules:
     1. Identify all distinct food items in: "{user_input}"
@@ -33,60 +129,302 @@ def parse_food_amount(user_input: str) -> list:
        - 'a bowl' → '1 bowl (250 g)'
        - 'a few slices' → '3 slices (30 g)'
        - 'medium serving' → '1 medium serving (117 g)'
-    4. Return ONLY a JSON array with format: [{{"food": "standardized name", "amount": "estimated quantity"}}]
+    4. Return ONLY a JSON object with format: {{"items": [{{"food": "standardized name", "amount": "estimated quantity"}}]}}
     
     Example input: "I had 2 scrambled eggs and a cup of coffee"
-    Example output: [{{"food": "egg, whole, raw", "amount": "2 large (100 g)"}}, {{"food": "coffee, brewed", "amount": "1 cup (240 ml)"}}]
+    Example output: {{"items": [{{"food": "egg, whole, raw", "amount": "2 large (100 g)"}}, {{"food": "coffee, brewed", "amount": "1 cup (240 ml)"}}]}}
+    """
+
+# Parsed items per user input; the parser is deterministic, so repeats skip the LLM
+_PARSE_CACHE = _LRUCache(maxsize=1024)
+
+async def parse_food_amount(user_input: str, on_item=None) -> list:
+    """Parse food items and estimate portions from user input
+    
+    The reply is streamed; on_item, if given, is called with each food item
+    as soon as its JSON object is complete, before the rest is generated.
     """
+    if user_input in _PARSE_CACHE:
+        return _PARSE_CACHE[user_input]
+    
+    prompt = _PARSE_TMPL.format(user_input=user_input)
     
     try:
-        response = llm.invoke(prompt)
-        print("[DEBUG] Parsing response:", response.content)
+        scanner = _JsonScanner()
+        async for chunk in parse_llm.astream(prompt):
+            for obj in scanner.feed(chunk.content):
+                if on_item is None:
+                    continue
+                try:
+                    item = orjson.loads(obj)
+                except orjson.JSONDecodeError:
+                    continue
+                if item.get("food"):
+                    on_item(item)
+        
+        content = scanner.buffer
+        logger.debug("Parsing response: %s", content)
         
-        # Extract JSON from response if wrapped in markdown
-        content = response.content
-        if '```json' in content:
-            content = content.split('```json')[1].split('```')[0].strip()
-        elif '```' in content:
-            content = content.split('```')[1].split('```')[0].strip()
+        # JSON mode replies parse directly; otherwise extract the JSON from
+        # markdown fences or surrounding text
+        try:
+            data = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            if scanner.first is None:
+                raise
+            data = scanner.value
         
-        return json.loads(content)
-    except (json.JSONDecodeError, IndexError) as e:
+        # JSON mode requires a top-level object, so items arrive wrapped
+        items = data.get("items", []) if isinstance(data, dict) else data
+        if items:
+            _PARSE_CACHE[user_input] = items
+        return items
+    except orjson.JSONDecodeError as e:
         print(f"JSON parsing error: {str(e)}")
         return []
     except Exception as e:
         print(f"Parsing error: {str(e)}")
         return []
 
-def query_usda(food_name: str) -> dict:
-    """Query USDA FoodData Central API for nutrition information"""
-    headers = {"Content-Type": "application/json"}
-    params = {
-        "api_key": usda_api_key,
-        "query": food_name,
-        "pageSize": 3,
-        "dataType": ["Foundation", "SR Legacy"],
-        "requireAllWords": "true"
+# Key nutrient tracked by the agent -> USDA nutrientNumbers, most preferred first.
+# Foundation foods often report energy only as Atwater kcal (958/957), sugars
+# as 269.3, fat as NLEA total fat (298) and fiber by AOAC 2011.25 (293); a few
+# SR Legacy foods carry only adjusted protein (257).
+NUTRIENT_SOURCES = {
+    "calories": ("208", "958", "957"),
+    "protein": ("203", "257"),
+    "fat": ("204", "298"),
+    "carbohydrates": ("205",),
+    "fiber": ("291", "293"),
+    "sugars": ("269", "269.3"),
+    "saturated_fat": ("606",),
+    "sodium": ("307",)
+}
+# USDA nutrientNumber -> (key nutrient, priority rank)
+NUTRIENT_MAP = {
+    number: (key, rank)
+    for key, numbers in NUTRIENT_SOURCES.items()
+    for rank, number in enumerate(numbers)
+}
+_NUTRIENT_KEYS = tuple(NUTRIENT_SOURCES)
+NUTRIENT_NUMBERS = frozenset(NUTRIENT_MAP)
+_get_nutrient = itemgetter("nutrientNumber", "value")
+
+# Pooled, retried HTTP access to the USDA API
+USDA_BASE_URL = "https://api.nal.usda.gov/fdc/v1"
+_USDA_TIMEOUT = aiohttp.ClientTimeout(total=15)
+_USDA_POOL_SIZE = 16
+_USDA_MAX_RETRIES = 3
+_USDA_BACKOFF = 0.3
+_USDA_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_USDA_MAX_RETRY_AFTER = 30
+# Ask for compressed JSON; aiohttp inflates it and bodies are parsed as bytes
+_USDA_HEADERS = {"Accept-Encoding": "gzip, deflate", "Accept": "application/json"}
+
+def create_usda_session() -> aiohttp.ClientSession:
+    """Create a keep-alive session that can be reused across agent calls"""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=_USDA_POOL_SIZE),
+        timeout=_USDA_TIMEOUT
+    )
+
+async def _read_json(resp: aiohttp.ClientResponse):
+    """Decode a whole JSON response body"""
+    return orjson.loads(await resp.read())
+
+async def _read_best_food(resp: aiohttp.ClientResponse) -> dict:
+    """Stream a search response, keeping only the top-scoring food and its key nutrients"""
+    best_match = {}
+    async for food in ijson.items(resp.content, "foods.item", use_float=True):
+        if not best_match or food.get("score", 0) > best_match.get("score", 0):
+            best_match = food
+    
+    if best_match:
+        best_match["foodNutrients"] = [
+            {"nutrientNumber": n["nutrientNumber"], "value": n.get("value", 0)}
+            for n in best_match.get("foodNutrients", [])
+            if n.get("nutrientNumber") in NUTRIENT_NUMBERS
+        ]
+    return best_match
+
+def _retry_after(header: str, default: float) -> float:
+    """Seconds to wait from a Retry-After header (delta or HTTP date), capped"""
+    if not header:
+        return default
+    try:
+        delay = float(header)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(header)
+        except (TypeError, ValueError):
+            return default
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        delay = (when - datetime.now(timezone.utc)).total_seconds()
+    return min(max(delay, 0.0), _USDA_MAX_RETRY_AFTER)
+
+async def _usda_request(session: aiohttp.ClientSession, method: str, path: str, read=_read_json, **kwargs):
+    """Send a USDA API request, retrying transient failures with exponential backoff"""
+    headers = {**_USDA_HEADERS, **kwargs.pop("headers", {})}
+    for attempt in range(_USDA_MAX_RETRIES + 1):
+        delay = _USDA_BACKOFF * 2 ** attempt
+        try:
+            async with session.request(method, USDA_BASE_URL + path, headers=headers, **kwargs) as resp:
+                if resp.status not in _USDA_RETRY_STATUSES or attempt == _USDA_MAX_RETRIES:
+                    resp.raise_for_status()
+                    return await read(resp)
+                delay = _retry_after(resp.headers.get("Retry-After"), delay)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == _USDA_MAX_RETRIES:
+                raise
+        # Sleep only after the response is released, so the pooled connection is free
+        await asyncio.sleep(delay)
+
+# Local SQLite mirror of Foundation + SR Legacy, built by build_usda_db.py
+USDA_DB_PATH = os.getenv(
+    "USDA_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "usda.sqlite")
+)
+_usda_db_conn = None
+_WORD_RE = re.compile(r"\w+")
+
+def _usda_db():
+    """Open the local USDA mirror once; None if it has not been built"""
+    global _usda_db_conn
+    if _usda_db_conn is None and os.path.exists(USDA_DB_PATH):
+        _usda_db_conn = sqlite3.connect(USDA_DB_PATH, check_same_thread=False)
+    return _usda_db_conn
+
+def query_usda_local(food_name: str) -> dict:
+    """Look up a food in the local USDA mirror, shaped like a search result"""
+    db = _usda_db()
+    if db is None:
+        return {}
+    
+    # Quote each word so punctuation in USDA names is not read as FTS syntax
+    terms = " ".join(f'"{word}"' for word in _WORD_RE.findall(food_name))
+    if not terms:
+        return {}
+    
+    try:
+        row = db.execute(
+            "SELECT f.fdc_id, f.description FROM foods_fts "
+            "JOIN foods f ON f.fdc_id = foods_fts.rowid "
+            "WHERE foods_fts MATCH ? ORDER BY bm25(foods_fts) LIMIT 1",
+            (terms,)
+        ).fetchone()
+        if row is None:
+            return {}
+        
+        fdc_id, description = row
+        rows = db.execute(
+            "SELECT nutrient_number, amount FROM food_nutrients "
+            f"WHERE fdc_id = ? AND nutrient_number IN ({', '.join('?' * len(NUTRIENT_MAP))})",
+            (fdc_id, *NUTRIENT_MAP)
+        ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Local USDA lookup error: {str(e)}")
+        return {}
+    
+    return {
+        "fdcId": fdc_id,
+        "description": description,
+        "foodNutrients": [{"nutrientNumber": number, "value": amount} for number, amount in rows]
     }
+
+# In-process caches: best USDA match per normalized food name, nutrients per fdcId
+_USDA_CACHE = _LRUCache(maxsize=4096)
+_NUTRIENT_CACHE = _LRUCache(maxsize=4096)
+
+# Normalized food names USDA has no match for, kept across runs
+USDA_MISSES_PATH = os.getenv(
+    "USDA_MISSES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "usda_misses.json")
+)
+
+def _load_usda_misses() -> set:
+    """Load the persisted set of food names with no USDA match"""
+    try:
+        with open(USDA_MISSES_PATH, "rb") as f:
+            return set(orjson.loads(f.read()))
+    except FileNotFoundError:
+        return set()
+    except (OSError, orjson.JSONDecodeError) as e:
+        print(f"Could not load USDA misses: {str(e)}")
+        return set()
+
+_USDA_MISSES = _load_usda_misses()
+_usda_misses_dirty = False
+
+def save_usda_misses():
+    """Flush newly recorded USDA misses to disk"""
+    global _usda_misses_dirty
+    if not _usda_misses_dirty:
+        return
+    # Write a temp file and swap it in, so a crash cannot leave a truncated file
+    tmp_path = USDA_MISSES_PATH + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(sorted(_USDA_MISSES)))
+        os.replace(tmp_path, USDA_MISSES_PATH)
+        _usda_misses_dirty = False
+    except OSError as e:
+        print(f"Could not save USDA misses: {str(e)}")
+
+def _normalize_food_name(food_name: str) -> str:
+    """Canonical form of a food name, used as the lookup and cache key"""
+    return food_name.strip().lower()
+
+def _food_key(item) -> str:
+    """Normalized food name of a parsed item, or "" if the LLM gave no usable name"""
+    food_name = item.get("food") if isinstance(item, dict) else None
+    if not isinstance(food_name, str):
+        return ""
+    return _normalize_food_name(food_name)
+
+async def query_usda_async(session: aiohttp.ClientSession, food_name: str) -> dict:
+    """Query USDA FoodData Central API for nutrition information"""
+    global _usda_misses_dirty
+    food_name = _normalize_food_name(food_name)
+    if food_name in _USDA_CACHE:
+        return _USDA_CACHE[food_name]
+    
+    # Prefer the local mirror; only go to the network for foods it cannot match
+    local_match = query_usda_local(food_name)
+    if local_match:
+        _USDA_CACHE[food_name] = local_match
+        return local_match
+    if food_name in _USDA_MISSES:
+        return {}
+    if not usda_api_key:
+        print(f"USDA API error: USDA_API_KEY is not set, cannot look up '{food_name}'")
+        return {}
+    
+    # aiohttp does not expand list values, so repeat dataType explicitly
+    params = [
+        ("api_key", usda_api_key),
+        ("query", food_name),
+        ("pageSize", 3),
+        ("dataType", "Foundation"),
+        ("dataType", "SR Legacy"),
+        ("requireAllWords", "true")
+    ]
     
     try:
-        resp = requests.get(
-            "https://api.nal.usda.gov/fdc/v1/foods/search",
-            headers=headers,
-            params=params,
-            timeout=15
+        best_match = await _usda_request(
+            session, "GET", "/foods/search",
+            read=_read_best_food, params=params
         )
-        resp.raise_for_status()
-        data = resp.json()
         
-        if not data.get("foods"):
+        if not best_match:
             print(f"No USDA data found for '{food_name}'")
+            _USDA_MISSES.add(food_name)
+            _usda_misses_dirty = True
             return {}
             
-        # Select best match (highest score)
-        best_match = max(data["foods"], key=lambda x: x.get("score", 0))
+        _USDA_CACHE[food_name] = best_match
         return best_match
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"USDA API error: {str(e)}")
         return {}
     except Exception as e:
@@ -95,65 +433,45 @@ def query_usda(food_name: str) -> dict:
 
 def extract_nutrients(usda_data: dict) -> dict:
     """Extract key nutrients from USDA API response"""
+    fdc_id = usda_data.get("fdcId")
+    if fdc_id in _NUTRIENT_CACHE:
+        return _NUTRIENT_CACHE[fdc_id]
+    
+    # Both sources (search, local mirror) emit nutrientNumber/value rows
     nutrients = {}
-    for nutrient in usda_data.get("foodNutrients", []):
-        name = nutrient.get("nutrientName", "").lower()
-        value = nutrient.get("value", 0)
-        unit = nutrient.get("unitName", "").lower()
-        
-        # Match key nutrients with different naming variations
-        if "energy" in name and "kcal" in unit:
-            nutrients["calories"] = value
-        elif "protein" in name:
-            nutrients["protein"] = value
-        elif "total lipid" in name or "total fat" in name:
-            nutrients["fat"] = value
-        elif "carbohydrate" in name and "by difference" in name:
-            nutrients["carbohydrates"] = value
-        elif "fiber" in name and "total dietary" in name:
-            nutrients["fiber"] = value
-        elif "sugars" in name and "total" in name:
-            nutrients["sugars"] = value
-        elif "fatty acids" in name and "saturated" in name:
-            nutrients["saturated_fat"] = value
-        elif "sodium" in name:
-            nutrients["sodium"] = value
+    ranks = {}
+    for n in usda_data.get("foodNutrients", ()):
+        number, value = _get_nutrient(n)
+        source = NUTRIENT_MAP.get(number)
+        if source is None:
+            continue
+        # Keep the most preferred row when several report the same nutrient
+        key, rank = source
+        if rank < ranks.get(key, len(NUTRIENT_MAP)):
+            nutrients[key] = value
+            ranks[key] = rank
     
+    if fdc_id is not None:
+        _NUTRIENT_CACHE[fdc_id] = nutrients
     return nutrients
 
 def calculate_meal_totals(meal_info: list) -> dict:
     """Calculate total nutrition values for the meal"""
-    totals = {
-        "calories": 0,
-        "protein": 0,
-        "fat": 0,
-        "carbohydrates": 0,
-        "fiber": 0,
-        "sugars": 0,
-        "saturated_fat": 0,
-        "sodium": 0
-    }
-    
+    totals = Counter()
     for item in meal_info:
-        nutrients = item.get("nutrients", {})
-        for key in totals:
-            if key in nutrients:
-                totals[key] += nutrients[key]
+        totals.update(item.get("nutrients", {}))
     
-    return totals
+    return {key: totals.get(key, 0) for key in _NUTRIENT_KEYS}
 
-def generate_analysis(meal_totals: dict) -> str:
-    """Generate nutrition analysis and score using LLM"""
-    nutrients = meal_totals
-    prompt = f"""
+_ANALYSIS_TMPL = """
     You are a professional nutritionist analyzing a meal. Use USDA Dietary Guidelines to evaluate:
-    - Calories: {nutrients['calories']} kcal
-    - Protein: {nutrients['protein']}g
-    - Total Fat: {nutrients['fat']}g (Saturated: {nutrients.get('saturated_fat', 0)}g)
-    - Carbohydrates: {nutrients['carbohydrates']}g
-    - Fiber: {nutrients['fiber']}g
-    - Sugars: {nutrients.get('sugars', 0)}g
-    - Sodium: {nutrients.get('sodium', 0)}mg
+    - Calories: {calories} kcal
+    - Protein: {protein}g
+    - Total Fat: {fat}g (Saturated: {saturated_fat}g)
+    - Carbohydrates: {carbohydrates}g
+    - Fiber: {fiber}g
+    - Sugars: {sugars}g
+    - Sodium: {sodium}mg
     
     Provide a comprehensive analysis with:
     1. Nutrition Score: X/10 (0-10 scale based on USDA guidelines)
@@ -176,59 +494,99 @@ def generate_analysis(meal_totals: dict) -> str:
     **Verdict:**
     - [Overall assessment]
     """
+
+async def generate_analysis(meal_totals: dict) -> AsyncIterator[str]:
+    """Generate nutrition analysis and score using LLM, yielding text as it streams"""
+    prompt = _ANALYSIS_TMPL.format(**meal_totals)
     
+    emitted = False
     try:
-        response = llm.invoke(prompt)
-        return response.content
+        async for chunk in analysis_llm.astream(prompt):
+            emitted = True
+            yield chunk.content
     except Exception as e:
         print(f"Analysis generation error: {str(e)}")
-        return "Unable to generate nutrition analysis at this time."
+        if emitted:
+            # Mark the cut-off instead of gluing a fallback onto partial text
+            yield "\n[Analysis interrupted]"
+        else:
+            yield "Unable to generate nutrition analysis at this time."
 
-def nutrition_agent(user_input: str) -> str:
-    """Main agent function to process meal input"""
-    print(f"[DEBUG] User input: {user_input}")
+async def nutrition_agent(user_input: str, session: aiohttp.ClientSession = None) -> AsyncIterator[str]:
+    """Main agent function to process meal input, yielding the analysis as it streams"""
+    logger.debug("User input: %s", user_input)
     
-    # Parse food items from input
-    parsed_foods = parse_food_amount(user_input)
-    if not parsed_foods:
-        return "❌ Could not identify any foods in your input. Please try again with more specific descriptions."
+    owns_session = session is None
+    if owns_session:
+        session = create_usda_session()
+    
+    # Start each USDA lookup as soon as the streamed parse yields its food,
+    # once per normalized name so spelling variants share one search
+    lookups = {}
+    def dispatch(item: dict):
+        food_name = _food_key(item)
+        if food_name and food_name not in lookups:
+            lookups[food_name] = asyncio.create_task(query_usda_async(session, food_name))
+    
+    try:
+        # Parse food items from input
+        parsed_foods = await parse_food_amount(user_input, on_item=dispatch)
+        if parsed_foods:
+            logger.debug("Parsed foods: %s", parsed_foods)
+            
+            # Resolve any foods the stream did not already dispatch
+            foods = [item for item in parsed_foods if _food_key(item)]
+            for item in foods:
+                dispatch(item)
+            matches = await asyncio.gather(
+                *[lookups[_food_key(item)] for item in foods]
+            )
+    finally:
+        for task in lookups.values():
+            task.cancel()
+        if owns_session:
+            await session.close()
+        save_usda_misses()
     
-    print(f"[DEBUG] Parsed foods: {json.dumps(parsed_foods, indent=2)}")
+    if not parsed_foods:
+        yield "❌ Could not identify any foods in your input. Please try again with more specific descriptions."
+        return
     
-    # Retrieve nutrition data for each food
     meal_info = []
-    for item in parsed_foods:
-        food_name = item.get("food", "")
+    for item, match in zip(foods, matches):
+        food_name = item["food"]
         amount = item.get("amount", "")
         
-        if not food_name:
-            continue
-            
-        usda_data = query_usda(food_name)
-        if not usda_data:
+        if not match:
             print(f"Skipping {food_name} - no USDA data")
             continue
-            
-        nutrients = extract_nutrients(usda_data)
+        
+        nutrients = extract_nutrients(match)
         meal_info.append({
             "food": food_name,
             "amount": amount,
             "nutrients": nutrients
         })
         
-        print(f"[DEBUG] {food_name} nutrients: {json.dumps(nutrients, indent=2)}")
+        logger.debug("%s nutrients: %s", food_name, nutrients)
     
     if not meal_info:
-        return "⚠️ No nutritional data found for the foods mentioned. Try different food names."
+        yield "⚠️ No nutritional data found for the foods mentioned. Try different food names."
+        return
     
     # Calculate meal totals
     meal_totals = calculate_meal_totals(meal_info)
-    print(f"[DEBUG] Meal totals: {json.dumps(meal_totals, indent=2)}")
+    logger.debug("Meal totals: %s", meal_totals)
     
     # Generate analysis
-    return generate_analysis(meal_totals)
+    async for chunk in generate_analysis(meal_totals):
+        yield chunk
 
 if __name__ == "__main__":
+    logging.basicConfig(format="[%(levelname)s] %(message)s")
+    logger.debug("DeepSeek Key: %s", deepseek_key[:8] + "..." if deepseek_key else "Not found")
+    logger.debug("USDA Key: %s", usda_api_key[:8] + "..." if usda_api_key else "Not found")
+    
     print("[AGENT] Please enter what you ate in this meal (e.g., 'I ate 2 eggs and a bowl of rice'):")
     user_input = input().strip()
     
@@ -236,6 +594,14 @@ if __name__ == "__main__":
         print("No input received. Exiting.")
         exit()
     
-    result = nutrition_agent(user_input)
-    print("\n[AGENT] Nutrition analysis and score:")
-    print(result)
\ No newline at end of file
+    async def print_analysis():
+        # Print the header once output starts, after the agent's debug lines
+        header_printed = False
+        async for chunk in nutrition_agent(user_input):
+            if not header_printed:
+                print("\n[AGENT] Nutrition analysis and score:")
+                header_printed = True
+            print(chunk, end="", flush=True)
+        print()
+    
+    asyncio.run(print_analysis())
\ No newline at end of file